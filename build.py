@@ -5,16 +5,25 @@ from typing import Any
 
 from mypyc.build import mypycify  # type: ignore
 
+# __init__.py only re-exports, so there's nothing to gain by compiling it.
 mypyc_paths = [
-    "pycooldown/__init__.py",
     "pycooldown/fixed_mapping.py",
     "pycooldown/flexible_mapping.py",
+    "pycooldown/sharded_map.py",
     "pycooldown/sliding_window.py",
 ]
 
 
 def build(setup_kwargs: dict[str, Any]) -> None:
+    # Bake the version into the package, so that importing it doesn't need
+    # to read the installed metadata.
+    version = setup_kwargs["version"]
+    with open("pycooldown/_version.py", "w") as f:
+        f.write(f'__version__ = "{version}"\n')
+
     # Don't build wheels in CI.
     if os.environ.get("CI", False):
         return
-    setup_kwargs["ext_modules"] = mypycify(mypyc_paths)
+    setup_kwargs["ext_modules"] = mypycify(
+        mypyc_paths, opt_level="3", strict_dunder_typing=True
+    )
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from importlib.metadata import version
+try:
+    from ._version import __version__
+except ImportError:  # a source checkout that hasn't been built
+    from importlib.metadata import version
+
+    __version__ = version(__name__)
 
 from .fixed_mapping import FixedCooldown
 from .flexible_mapping import FlexibleCooldown
 from .sliding_window import SlidingWindow
 
-__version__ = version(__name__)
-
 __all__ = ("__version__", "FixedCooldown", "SlidingWindow", "FlexibleCooldown")
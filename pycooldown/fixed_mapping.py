@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from time import time
-from typing import Generic, TypeVar
+from typing import Generic, Iterable, TypeVar
 
-from .sliding_window import SlidingWindow
+from .sharded_map import ShardedMap
+from .sliding_window import SlidingWindow, _clock
 
 _K = TypeVar("_K")
 
@@ -16,22 +16,19 @@ class FixedCooldown(Generic[_K]):
         capacity (float): The maximum number of units per timespan.
     """
 
+    __slots__ = ("period", "capacity", "_map")
+
     def __init__(self, capacity: float, period: float) -> None:
         self.period = period
         self.capacity = capacity
 
-        self._old: dict[_K, SlidingWindow] = {}
-        self._cur: dict[_K, SlidingWindow] = {}
-
-        self.last_cycle = time()
+        self._map: ShardedMap[_K, SlidingWindow] = ShardedMap()
 
     def __getitem__(self, key: _K) -> SlidingWindow:
-        if v := self._old.pop(key, None):
-            self._cur[key] = v
-        return self._cur[key]
+        return self._map[key]
 
     def __setitem__(self, key: _K, value: SlidingWindow) -> None:
-        self._cur[key] = value
+        self._map[key] = value
 
     def get_bucket(self, key: _K) -> SlidingWindow:
         """Get or create a cooldown window, whilst removing expired ones.
@@ -43,21 +40,20 @@ class FixedCooldown(Generic[_K]):
             SlidingWindow: The sliding window for the cooldown.
         """
 
-        now = time()
-        if now > self.last_cycle + self.period:
-            self.last_cycle = now
+        return self._get_bucket_at(key, _clock())
 
-            self._old.clear()
-            cur = self._cur
-            self._cur = self._old
-            self._old = cur
+    def _get_bucket_at(self, key: _K, now: int) -> SlidingWindow:
+        self._map.sweep(now, SlidingWindow._expired_at)
 
-        try:
-            return self[key]
-        except KeyError:
-            b = SlidingWindow(self.capacity, self.period)
-            self._cur[key] = b
-            return b
+        # an expired window refills itself on its next update, so there is
+        # no need to check for expiry here
+        b = self._map.get(key)
+        if b is None:
+            # if another thread stored a window first, that one is used
+            b = self._map.setdefault(
+                key, SlidingWindow(self.capacity, self.period)
+            )
+        return b
 
     def get_retry_after(self, key: _K) -> float:
         """Get the current retry-after, without triggering the cooldown.
@@ -69,7 +65,8 @@ class FixedCooldown(Generic[_K]):
             float: How many seconds before the cooldown can be triggered again.
         """
 
-        return self.get_bucket(key).get_retry_after()
+        now = _clock()
+        return self._get_bucket_at(key, now)._retry_after_at(now)
 
     def update_ratelimit(self, key: _K) -> float | None:
         """Trigger the cooldown. If the cooldown cannot be triggered, return
@@ -82,4 +79,41 @@ class FixedCooldown(Generic[_K]):
             float | None: The retry-after in seconds, if any, else None.
         """
 
-        return self.get_bucket(key).update_ratelimit()
+        now = _clock()
+        return self._get_bucket_at(key, now)._update_ratelimit_at(now)
+
+    def update_ratelimit_n(self, key: _K, n: int) -> float | None:
+        """Trigger the cooldown n times at once. If it cannot be triggered n
+        times, return the retry-after and leave the cooldown untouched.
+
+        Args:
+            key (Any): The key for the cooldown.
+            n (int): The number of units to use.
+
+        Raises:
+            ValueError: n is less than 1 or greater than the capacity.
+
+        Returns:
+            float | None: The retry-after in seconds, if any, else None.
+        """
+
+        now = _clock()
+        return self._get_bucket_at(key, now)._update_ratelimit_n_at(now, n)
+
+    def update_ratelimit_many(self, keys: Iterable[_K]) -> list[float | None]:
+        """Trigger the cooldown for several keys at once, reading the clock
+        only once.
+
+        Args:
+            keys (Iterable[Any]): The keys for the cooldowns.
+
+        Returns:
+            list[float | None]: The retry-after in seconds for each key, in
+            the same order, or None where the cooldown was triggered.
+        """
+
+        now = _clock()
+        return [
+            self._get_bucket_at(key, now)._update_ratelimit_at(now)
+            for key in keys
+        ]
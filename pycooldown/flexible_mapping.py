@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from time import time
-from typing import Generic, TypeVar
+from typing import Generic, Iterable, TypeVar
 
-from .sliding_window import SlidingWindow
+from .sharded_map import ShardedMap
+from .sliding_window import SlidingWindow, _clock
 
 _K = TypeVar("_K")
 
@@ -13,25 +13,21 @@ class FlexibleCooldown(Generic[_K]):
     capacity.
 
     Args:
-        max_period (float): The maximum value for a cooldown. The smaller this
-        is, the less memory the mapping will use.
+        max_period (float): The maximum value for a cooldown.
     """
 
+    __slots__ = ("max_period", "_map")
+
     def __init__(self, max_period: float) -> None:
         self.max_period = max_period
 
-        self._old: dict[_K, SlidingWindow] = {}
-        self._cur: dict[_K, SlidingWindow] = {}
-
-        self.last_cycle = time()
+        self._map: ShardedMap[_K, SlidingWindow] = ShardedMap()
 
     def __getitem__(self, key: _K) -> SlidingWindow:
-        if v := self._old.pop(key, None):
-            self._cur[key] = v
-        return self._cur[key]
+        return self._map[key]
 
     def __setitem__(self, key: _K, value: SlidingWindow) -> None:
-        self._cur[key] = value
+        self._map[key] = value
 
     def get_bucket(
         self, key: _K, capacity: float, period: float
@@ -52,29 +48,35 @@ class FlexibleCooldown(Generic[_K]):
             SlidingWindow: The cooldown for this key.
         """
 
+        return self._get_bucket_at(key, capacity, period, _clock())
+
+    def _get_bucket_at(
+        self, key: _K, capacity: float, period: float, now: int
+    ) -> SlidingWindow:
         if period > self.max_period:
             raise RuntimeError("The period must be less than max_period.")
 
-        now = time()
-        if now > self.last_cycle + self.max_period:
-            self.last_cycle = now
+        self._map.sweep(now, SlidingWindow._expired_at)
 
-            self._old.clear()
-            cur = self._cur
-            self._cur = self._old
-            self._old = cur
-
-        try:
-            b = self[key]
-            if b.capacity != capacity or b.period != period:
+        b = self._map.get(key)
+        if b is not None and (b.capacity != capacity or b.period != period):
+            # an expired window can be replaced by one with a different
+            # capacity or period
+            if not b._expired_at(now):
                 raise RuntimeError(
                     "Mismatch capacity or period. Each key can only have one "
                     "capacity value."
                 )
-        except KeyError:
-            b = SlidingWindow(capacity, period)
-            self._cur[key] = b
-
+            # only the expired window is removed, in case another thread has
+            # already replaced it
+            popped = self._map.pop(key)
+            if popped is not None and popped is not b:
+                self._map.setdefault(key, popped)
+            b = None
+
+        if b is None:
+            # if another thread stored a window first, that one is used
+            b = self._map.setdefault(key, SlidingWindow(capacity, period))
         return b
 
     def get_retry_after(
@@ -91,7 +93,9 @@ class FlexibleCooldown(Generic[_K]):
             float: The current retry-after in seconds.
         """
 
-        return self.get_bucket(key, capacity, period).get_retry_after()
+        now = _clock()
+        b = self._get_bucket_at(key, capacity, period, now)
+        return b._retry_after_at(now)
 
     def update_ratelimit(
         self, key: _K, capacity: float, period: float
@@ -107,4 +111,52 @@ class FlexibleCooldown(Generic[_K]):
             float | None: The retry-after in seconds, if any, else None.
         """
 
-        return self.get_bucket(key, capacity, period).update_ratelimit()
+        now = _clock()
+        b = self._get_bucket_at(key, capacity, period, now)
+        return b._update_ratelimit_at(now)
+
+    def update_ratelimit_n(
+        self, key: _K, capacity: float, period: float, n: int
+    ) -> float | None:
+        """Trigger the cooldown n times at once if possible, otherwise return
+        the retry-after and leave the cooldown untouched.
+
+        Args:
+            key (Any): The key for the cooldown.
+            period (float): The period for the cooldown.
+            capacity (float): The capacity for the cooldown.
+            n (int): The number of units to use.
+
+        Raises:
+            ValueError: n is less than 1 or greater than the capacity.
+
+        Returns:
+            float | None: The retry-after in seconds, if any, else None.
+        """
+
+        now = _clock()
+        b = self._get_bucket_at(key, capacity, period, now)
+        return b._update_ratelimit_n_at(now, n)
+
+    def update_ratelimit_many(
+        self, keys: Iterable[_K], capacity: float, period: float
+    ) -> list[float | None]:
+        """Trigger the cooldown for several keys that share a capacity and
+        period, reading the clock only once.
+
+        Args:
+            keys (Iterable[Any]): The keys for the cooldowns.
+            period (float): The period for the cooldowns.
+            capacity (float): The capacity for the cooldowns.
+
+        Returns:
+            list[float | None]: The retry-after in seconds for each key, in
+            the same order, or None where the cooldown was triggered.
+        """
+
+        now = _clock()
+        retry_afters: list[float | None] = []
+        for key in keys:
+            b = self._get_bucket_at(key, capacity, period, now)
+            retry_afters.append(b._update_ratelimit_at(now))
+        return retry_afters
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import sys
+from collections import deque
+from typing import Callable, Generic, Iterator, TypeVar
+
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+# The maximum number of keys checked for expiry per sweep.
+_SWEEP_SIZE = 32
+# How long to wait before sweeping again, if the last sweep found nothing
+# to remove, in nanoseconds.
+_SWEEP_INTERVAL = 1_000_000_000
+
+
+def _default_shards() -> int:
+    # Without the GIL, every dict is guarded by its own lock, so spreading
+    # keys across several dicts spreads the contention. With the GIL there
+    # is nothing to gain, so a single shard is used.
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    if is_gil_enabled is None or is_gil_enabled():
+        return 1
+    return 16
+
+
+class ShardedMap(Generic[_K, _V]):
+    """A mapping split across several dicts, selected by the key's hash.
+
+    Each operation is a single dict operation, so it is atomic on
+    free-threaded builds. Anything built from several operations is not, so
+    values should be created with setdefault rather than get and then set,
+    or two threads may each store their own value for a new key.
+
+    New keys are also queued for sweeping, so that a sweep never has to copy
+    or walk a whole shard. Sweeps re-check a value after removing it, and put
+    it back if another thread replaced or used it in the meantime.
+
+    Args:
+        shards (int | None): The number of shards. Must be a power of two.
+        Defaults to 16 on free-threaded builds, otherwise 1.
+    """
+
+    __slots__ = ("shards", "mask", "_sweep_queue", "_next_sweep")
+
+    def __init__(self, shards: int | None = None) -> None:
+        if shards is None:
+            shards = _default_shards()
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError("The number of shards must be a power of two.")
+
+        self.shards: list[dict[_K, _V]] = [{} for _ in range(shards)]
+        self.mask = shards - 1
+
+        self._sweep_queue: deque[_K] = deque()
+        self._next_sweep = 0
+
+    def __getitem__(self, key: _K) -> _V:
+        return self.shards[hash(key) & self.mask][key]
+
+    def __setitem__(self, key: _K, value: _V) -> None:
+        shard = self.shards[hash(key) & self.mask]
+        if key not in shard:
+            self._sweep_queue.append(key)
+        shard[key] = value
+
+    def __delitem__(self, key: _K) -> None:
+        del self.shards[hash(key) & self.mask][key]
+
+    def __contains__(self, key: _K) -> bool:
+        return key in self.shards[hash(key) & self.mask]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def __iter__(self) -> Iterator[_K]:
+        for shard in self.shards:
+            yield from shard
+
+    def get(self, key: _K) -> _V | None:
+        return self.shards[hash(key) & self.mask].get(key)
+
+    def setdefault(self, key: _K, default: _V) -> _V:
+        value = self.shards[hash(key) & self.mask].setdefault(key, default)
+        if value is default:
+            self._sweep_queue.append(key)
+        return value
+
+    def pop(self, key: _K, default: _V | None = None) -> _V | None:
+        return self.shards[hash(key) & self.mask].pop(key, default)
+
+    def sweep(self, now: int, expired: Callable[[_V, int], bool]) -> None:
+        """Remove a handful of expired values, so that the cost of removing
+        them is spread out evenly across calls. If the last sweep found
+        nothing to remove, the next one waits for a second.
+
+        Args:
+            now (int): The current time, from time.monotonic_ns().
+            expired (Callable[[Any, int], bool]): Whether a value has expired
+            at the given time.
+        """
+
+        if now >= self._next_sweep and not self._sweep_step(now, expired):
+            self._next_sweep = now + _SWEEP_INTERVAL
+
+    def _sweep_step(
+        self, now: int, expired: Callable[[_V, int], bool]
+    ) -> bool:
+        # Keys are taken from the front of the queue, and live ones are put
+        # back at the end. Keys that were removed elsewhere are dropped.
+        # Returns whether any values were removed.
+        queue = self._sweep_queue
+        removed = False
+        for _ in range(_SWEEP_SIZE):
+            try:
+                key = queue.popleft()
+            except IndexError:
+                break
+
+            v = self.get(key)
+            if v is None:
+                continue
+            if expired(v, now):
+                popped = self.pop(key)
+                if popped is v and expired(v, now):
+                    removed = True
+                    continue
+                if popped is None:
+                    continue
+                self.shards[hash(key) & self.mask].setdefault(key, popped)
+            queue.append(key)
+
+        return removed
@@ -23,12 +23,22 @@
 
 from __future__ import annotations
 
-from time import time
+from time import monotonic_ns
+from typing import Callable, Final, final
 
+# A Final name is kept in a C static by mypyc, rather than being looked up in
+# the module globals on every call.
+_clock: Final[Callable[[], int]] = monotonic_ns
 
+
+@final
 class SlidingWindow:
     """A sliding window implementation, based on discord.py's Cooldown class.
 
+    Timestamps are read from the monotonic clock rather than wall time, so
+    they are only meaningful relative to each other. They are stored as whole
+    nanoseconds so that comparisons are exact integer arithmetic.
+
     Args:
         period (float): The period for the sliding window.
         capacity (float): The capacity for the sliding window.
@@ -37,74 +47,119 @@ class SlidingWindow:
     # NOTE: This sliding window implementation was copied from the Cooldown
     # class in Rapptz/discord.py.
 
-    __slots__ = ("capacity", "period", "_window", "_tokens", "_last")
+    # The fields read on every update come first, so that they sit next to
+    # each other in the compiled struct.
+    __slots__ = ("_tokens", "_window_ns", "_period_ns", "capacity", "period")
 
     def __init__(self, capacity: float, period: float) -> None:
-        self.capacity: int = int(capacity)
-        self.period: float = float(period)
-        self._window: float = 0.0
-        self._tokens: int = self.capacity
-        self._last: float = 0.0
+        tokens = int(capacity)
+        period = float(period)
+        period_ns = round(period * 1_000_000_000)
+
+        self._tokens: int = tokens
+        # The monotonic clock may start as late as boot, so an unused window
+        # is placed far enough in the past to have expired at any reading.
+        self._window_ns: int = -period_ns - 1
+        self._period_ns: Final[int] = period_ns
+        self.capacity: Final[int] = tokens
+        self.period: Final[float] = period
 
     def get_tokens(self, current: float | None = None) -> int:
-        if not current:
-            current = time()
+        """Get the number of units left in the current window.
 
-        tokens = self._tokens
+        Args:
+            current (float | None, optional): The time to check at, as
+            returned by time.monotonic(). Defaults to None, meaning now.
 
-        if current > self._window + self.period:
-            tokens = self.capacity
-        return tokens
+        Returns:
+            int: The number of units left.
+        """
+
+        if current is None:
+            return self._tokens_now()
+        return self._tokens_at(round(current * 1_000_000_000))
+
+    def _tokens_now(self) -> int:
+        return self._tokens_at(_clock())
+
+    def _tokens_at(self, current: int) -> int:
+        if current > self._window_ns + self._period_ns:
+            return self.capacity
+        return self._tokens
+
+    def _expired_at(self, current: int) -> bool:
+        return current > self._window_ns + self._period_ns
 
     def get_retry_after(self) -> float:
         """Get the retry-after without triggering the cooldown.
 
-        Args:
-            current (float | None, optional): The current time. Defaults to
-            None.
-
         Returns:
             float: The retry-after, in seconds.
         """
 
-        current = time()
-        tokens = self.get_tokens(current)
+        return self._retry_after_at(_clock())
+
+    def _retry_after_at(self, current: int) -> float:
+        window = self._window_ns
+        period = self._period_ns
 
-        if tokens == 0:
-            return self.period - (current - self._window)
+        if self._tokens == 0 and current <= window + period:
+            return (period - (current - window)) / 1_000_000_000
 
         return 0.0
 
     def update_ratelimit(self) -> float | None:
         """Trigger the cooldown if possible, otherwise return the retry-after.
 
+        Returns:
+            float | None: The retry-after, if any, else None.
+        """
+
+        return self._update_ratelimit_at(_clock())
+
+    def update_ratelimit_n(self, n: int) -> float | None:
+        """Trigger the cooldown n times at once if possible, otherwise return
+        the retry-after. Either all n units are used, or none are.
+
         Args:
-            current (float | None, optional): The current time. Defaults to
-            None.
+            n (int): The number of units to use.
+
+        Raises:
+            ValueError: n is less than 1 or greater than the capacity.
 
         Returns:
             float | None: The retry-after, if any, else None.
         """
 
-        current = time()
-        self._last = current
+        return self._update_ratelimit_n_at(_clock(), n)
 
-        self._tokens = self.get_tokens(current)
+    def _update_ratelimit_n_at(self, current: int, n: int) -> float | None:
+        if n < 1 or n > self.capacity:
+            raise ValueError("n must be between 1 and the capacity.")
+        return self._update_ratelimit_at(current, n)
 
-        # first token used means that we start a new rate limit window
-        if self._tokens == self.capacity:
-            self._window = current
+    def _update_ratelimit_at(self, current: int, n: int = 1) -> float | None:
+        window = self._window_ns
+        period = self._period_ns
+        tokens = self._tokens
+
+        # the previous window has passed, so we start a new one
+        if current > window + period:
+            tokens = self.capacity
+            window = current
+            self._tokens = tokens
+            self._window_ns = current
 
         # check if we are rate limited
-        if self._tokens == 0:
-            return self.period - (current - self._window)
+        if tokens < n:
+            return (period - (current - window)) / 1_000_000_000
 
         # we're not so decrement our tokens
-        self._tokens -= 1
+        self._tokens = tokens - n
         return None
 
     def reset(self) -> None:
         """Reset the cooldown."""
 
         self._tokens = self.capacity
-        self._last = 0.0
+        self._window_ns = -self._period_ns - 1
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+from math import isclose
+
 import pytest
 from mock import Mock
 from pytest_mock import MockerFixture
 
 from pycooldown.fixed_mapping import FixedCooldown
+from pycooldown.sharded_map import ShardedMap
+from pycooldown.sliding_window import SlidingWindow
 
 
 @pytest.mark.parametrize(["period", "capacity"], [(1, 1), (1, 2), (2, 1)])
@@ -12,8 +16,7 @@ def test_init(period: float, capacity: int) -> None:
     mapping = FixedCooldown(capacity, period)
     assert mapping.period == period
     assert mapping.capacity == capacity
-    assert len(mapping._old) == 0
-    assert len(mapping._cur) == 0
+    assert len(mapping._map) == 0
 
 
 def test_get_bucket() -> None:
@@ -37,78 +40,130 @@ def test_getitem() -> None:
     assert mapping["test"] is bucket
 
 
-def test_getitem_moves_bucket() -> None:
+def test_setitem() -> None:
     mapping: FixedCooldown[str] = FixedCooldown(1, 1)
 
     bucket_mock = Mock()
-    mapping._old["test"] = bucket_mock
-    bucket = mapping.get_bucket("test")
+    mapping["test"] = bucket_mock
 
-    assert bucket is bucket_mock
-    assert "test" not in mapping._old
-    assert "test" in mapping._cur
+    assert "test" in mapping._map
+    assert mapping._map["test"] is bucket_mock
 
 
-def test_setitem() -> None:
+def test_get_bucket_reuses_expired() -> None:
     mapping: FixedCooldown[str] = FixedCooldown(1, 1)
 
-    bucket_mock = Mock()
-    mapping["test"] = bucket_mock
+    bucket = mapping.get_bucket("test")
+    bucket.update_ratelimit()
+    assert mapping.update_ratelimit("test") is not None
 
-    assert "test" in mapping._cur
-    assert mapping._cur["test"] is bucket_mock
-    assert "test" not in mapping._old
+    # expire the bucket, test that it is reused and refilled
+    bucket._window_ns -= 2 * bucket._period_ns
+    assert mapping.get_bucket("test") is bucket
+    assert mapping.update_ratelimit("test") is None
 
 
-def test_cycle() -> None:
+def test_sweep() -> None:
     mapping: FixedCooldown[str] = FixedCooldown(1, 1)
 
-    # create buckets and add them to the mapping
-    bucket1 = Mock()
-    bucket2 = Mock()
-    mapping._old["test1"] = bucket1
-    mapping._cur["test2"] = bucket2
+    # create an active bucket and an expired bucket
+    active = mapping.get_bucket("active")
+    active.update_ratelimit()
+    mapping["expired"] = SlidingWindow(1, 1)
 
-    # cycle the mapping
-    mapping.last_cycle = 0
-    bucket3 = mapping.get_bucket("test3")
+    # test that the last sweep found nothing, so no sweep is due yet
+    mapping.get_bucket("active")
+    assert "expired" in mapping._map
 
-    # test that the buckets were moved correctly
-    assert mapping._old == {"test2": bucket2}
-    assert mapping._cur == {"test3": bucket3}
+    # start a new sweep
+    mapping._map._next_sweep = 0
+    mapping.get_bucket("active")
+
+    # test that only the expired bucket was removed
+    assert tuple(mapping._map) == ("active",)
+    assert mapping._map["active"] is active
+
+
+def test_sweep_visits_every_shard() -> None:
+    mapping: FixedCooldown[int] = FixedCooldown(1, 1)
+    mapping._map = ShardedMap(4)
+
+    # create an expired bucket in each shard
+    for i in range(4):
+        mapping[i] = SlidingWindow(1, 1)
+
+    # test that the sweep queue covers every shard
+    mapping.update_ratelimit(-1)
+
+    assert tuple(mapping._map) == (-1,)
 
 
 def test_get_retry_after(mocker: MockerFixture) -> None:
     mapping: FixedCooldown[str] = FixedCooldown(1, 1)
 
-    # test that "get_bucket" is called
-    gb_spy = mocker.spy(mapping, "get_bucket")
+    # test that "_get_bucket_at" is called
+    gb_spy = mocker.spy(FixedCooldown, "_get_bucket_at")
     mapping.get_retry_after("test")
-    gb_spy.assert_called_once_with("test")
+    gb_spy.assert_called_once_with(mapping, "test", mocker.ANY)
 
-    # patch get_bucket, test that retry_after is called and returned
-    gb_mock = mocker.patch.object(mapping, "get_bucket")
+    # patch _get_bucket_at, test that the bucket is checked at the same time
+    gb_mock = mocker.patch.object(FixedCooldown, "_get_bucket_at")
     bucket_mock = Mock()
     gb_mock.return_value = bucket_mock
 
     ret = mapping.get_retry_after("test")
-    bucket_mock.get_retry_after.assert_called_once_with()
-    assert ret is bucket_mock.get_retry_after()
+    now = gb_mock.call_args.args[1]
+    bucket_mock._retry_after_at.assert_called_once_with(now)
+    assert ret is bucket_mock._retry_after_at()
 
 
 def test_update_ratelimit(mocker: MockerFixture) -> None:
     mapping: FixedCooldown[str] = FixedCooldown(1, 1)
 
-    # test that "get_bucket" is called
-    gb_spy = mocker.spy(mapping, "get_bucket")
+    # test that "_get_bucket_at" is called
+    gb_spy = mocker.spy(FixedCooldown, "_get_bucket_at")
     mapping.update_ratelimit("test")
-    gb_spy.assert_called_once_with("test")
+    gb_spy.assert_called_once_with(mapping, "test", mocker.ANY)
 
-    # patch get_bucket, test that update_ratelimit is called and returned
-    gb_mock = mocker.patch.object(mapping, "get_bucket")
+    # patch _get_bucket_at, test that the bucket is updated at the same time
+    gb_mock = mocker.patch.object(FixedCooldown, "_get_bucket_at")
     bucket_mock = Mock()
     gb_mock.return_value = bucket_mock
 
     ret = mapping.update_ratelimit("test")
-    bucket_mock.update_ratelimit.assert_called_once_with()
-    assert ret is bucket_mock.update_ratelimit()
+    now = gb_mock.call_args.args[1]
+    bucket_mock._update_ratelimit_at.assert_called_once_with(now)
+    assert ret is bucket_mock._update_ratelimit_at()
+
+
+def test_update_ratelimit_n(mocker: MockerFixture) -> None:
+    mapping: FixedCooldown[str] = FixedCooldown(1, 1)
+
+    # patch _get_bucket_at, test that the bucket is updated at the same time
+    gb_mock = mocker.patch.object(FixedCooldown, "_get_bucket_at")
+    bucket_mock = Mock()
+    gb_mock.return_value = bucket_mock
+
+    ret = mapping.update_ratelimit_n("test", 2)
+    now = gb_mock.call_args.args[1]
+    bucket_mock._update_ratelimit_n_at.assert_called_once_with(now, 2)
+    assert ret is bucket_mock._update_ratelimit_n_at()
+
+
+def test_update_ratelimit_many() -> None:
+    mapping: FixedCooldown[str] = FixedCooldown(1, 1)
+
+    first, second, third = mapping.update_ratelimit_many(["a", "a", "b"])
+
+    assert first is None
+    assert second is not None
+    assert isclose(second, 1.0, rel_tol=0.15)
+    assert third is None
+
+
+@pytest.mark.parametrize("n", [-1, 2])
+def test_update_ratelimit_n_invalid(n: int) -> None:
+    mapping: FixedCooldown[str] = FixedCooldown(1, 1)
+
+    with pytest.raises(ValueError):
+        mapping.update_ratelimit_n("test", n)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from math import isclose
+
+import pytest
+
+from pycooldown.flexible_mapping import FlexibleCooldown
+
+
+def test_init() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    assert mapping.max_period == 10
+    assert len(mapping._map) == 0
+
+
+def test_get_bucket() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    bucket = mapping.get_bucket("test", 2, 5)
+    assert bucket.capacity == 2
+    assert bucket.period == 5
+    assert mapping["test"] is bucket
+
+
+def test_get_bucket_period_too_long() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+
+    with pytest.raises(RuntimeError):
+        mapping.get_bucket("test", 1, 11)
+
+
+def test_get_bucket_mismatch() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    mapping.update_ratelimit("test", 1, 1)
+
+    # test that different settings are rejected while the window is live
+    with pytest.raises(RuntimeError):
+        mapping.get_bucket("test", 2, 1)
+    with pytest.raises(RuntimeError):
+        mapping.get_bucket("test", 1, 2)
+
+
+def test_get_bucket_replaces_expired_mismatch() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    bucket = mapping.get_bucket("test", 1, 1)
+    bucket.update_ratelimit()
+
+    # expire the bucket, test that it is replaced with the new settings
+    bucket._window_ns -= 2 * bucket._period_ns
+    new = mapping.get_bucket("test", 2, 1)
+    assert new is not bucket
+    assert new.capacity == 2
+    assert mapping["test"] is new
+
+
+def test_get_bucket_replaces_unused_mismatch() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    bucket = mapping.get_bucket("test", 1, 1)
+
+    # test that a window that was never triggered counts as expired
+    assert mapping.get_bucket("test", 2, 1) is not bucket
+
+
+def test_get_bucket_reuses_expired() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    bucket = mapping.get_bucket("test", 1, 1)
+    bucket.update_ratelimit()
+    assert mapping.update_ratelimit("test", 1, 1) is not None
+
+    # expire the bucket, test that it is reused and refilled
+    bucket._window_ns -= 2 * bucket._period_ns
+    assert mapping.get_bucket("test", 1, 1) is bucket
+    assert mapping.update_ratelimit("test", 1, 1) is None
+
+
+def test_get_retry_after() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+    assert mapping.get_retry_after("test", 1, 1) == 0.0
+
+    mapping.update_ratelimit("test", 1, 1)
+    assert isclose(mapping.get_retry_after("test", 1, 1), 1.0, rel_tol=0.15)
+
+
+def test_update_ratelimit() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+
+    assert mapping.update_ratelimit("test", 1, 1) is None
+    retry_after = mapping.update_ratelimit("test", 1, 1)
+    assert retry_after is not None
+    assert isclose(retry_after, 1.0, rel_tol=0.15)
+
+
+def test_update_ratelimit_n() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+
+    assert mapping.update_ratelimit_n("test", 3, 1, 2) is None
+    assert mapping["test"].get_tokens() == 1
+
+    # test that no units are used if there aren't enough
+    assert mapping.update_ratelimit_n("test", 3, 1, 2) is not None
+    assert mapping["test"].get_tokens() == 1
+
+
+@pytest.mark.parametrize("n", [-1, 0, 4])
+def test_update_ratelimit_n_invalid(n: int) -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+
+    with pytest.raises(ValueError):
+        mapping.update_ratelimit_n("test", 3, 1, n)
+
+
+def test_update_ratelimit_many() -> None:
+    mapping: FlexibleCooldown[str] = FlexibleCooldown(10)
+
+    first, second, third = mapping.update_ratelimit_many(["a", "a", "b"], 1, 1)
+
+    assert first is None
+    assert second is not None
+    assert isclose(second, 1.0, rel_tol=0.15)
+    assert third is None
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import pytest
+
+from pycooldown.sharded_map import _SWEEP_SIZE, ShardedMap
+
+
+@pytest.mark.parametrize("shards", [1, 2, 16])
+def test_init(shards: int) -> None:
+    mapping: ShardedMap[str, int] = ShardedMap(shards)
+    assert len(mapping.shards) == shards
+    assert mapping.mask == shards - 1
+    assert len(mapping) == 0
+
+
+@pytest.mark.parametrize("shards", [0, 3, -1])
+def test_init_invalid_shards(shards: int) -> None:
+    with pytest.raises(ValueError):
+        ShardedMap(shards)
+
+
+def test_items() -> None:
+    mapping: ShardedMap[int, str] = ShardedMap(4)
+
+    # test that keys are spread across shards
+    for i in range(4):
+        mapping[i] = str(i)
+    assert all(len(shard) == 1 for shard in mapping.shards)
+
+    assert len(mapping) == 4
+    assert sorted(mapping) == [0, 1, 2, 3]
+    assert mapping[2] == "2"
+    assert mapping.get(2) == "2"
+    assert mapping.get(5) is None
+    assert 3 in mapping
+
+    del mapping[3]
+    assert 3 not in mapping
+    assert mapping.pop(3) is None
+    assert mapping.pop(2) == "2"
+    assert 2 not in mapping
+
+    # test that setdefault only stores a value for a new key
+    assert mapping.setdefault(0, "new") == "0"
+    assert mapping.setdefault(2, "new") == "new"
+    assert mapping[2] == "new"
+    with pytest.raises(KeyError):
+        mapping[3]
+
+
+def test_sweep() -> None:
+    mapping: ShardedMap[int, int] = ShardedMap(2)
+
+    # values are expiry times, so at time 4 keys 0-3 have expired
+    for i in range(8):
+        mapping[i] = i
+
+    def expired(value: int, now: int) -> bool:
+        return now > value
+
+    mapping.sweep(4, expired)
+
+    assert sorted(mapping) == [4, 5, 6, 7]
+
+    # test that a sweep that removed nothing delays the next one
+    mapping.sweep(4, expired)
+    assert mapping._next_sweep > 4
+    mapping.sweep(5, expired)
+    assert 4 in mapping
+
+
+def test_sweep_keeps_replaced_value() -> None:
+    mapping: ShardedMap[str, list[int]] = ShardedMap(1)
+    old = [0]
+    new = [10]
+    mapping["key"] = old
+
+    def expired(value: list[int], now: int) -> bool:
+        # simulate another thread replacing the value after it was checked
+        mapping["key"] = new
+        return now > value[0]
+
+    mapping.sweep(5, expired)
+
+    assert mapping["key"] is new
+
+
+@pytest.mark.parametrize("shards", [1, 16])
+def test_sweep_is_bounded(shards: int) -> None:
+    mapping: ShardedMap[int, int] = ShardedMap(shards)
+    for i in range(10 * _SWEEP_SIZE):
+        mapping[i] = i
+
+    checked: list[int] = []
+
+    def expired(value: int, now: int) -> bool:
+        checked.append(value)
+        return False
+
+    # test that one sweep checks a fixed number of keys, however many there
+    # are, and puts the live ones back in the queue
+    mapping.sweep(0, expired)
+    assert checked == list(range(_SWEEP_SIZE))
+    assert len(mapping._sweep_queue) == 10 * _SWEEP_SIZE
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from math import isclose
+from time import monotonic
 
 import pytest
 
-from pycooldown.sliding_window import SlidingWindow
+from pycooldown.sliding_window import SlidingWindow, _clock
 
 
 @pytest.mark.parametrize(["period", "capacity"], [(1, 1), (1, 2), (2, 1)])
@@ -12,9 +13,8 @@ def test_init(period: float, capacity: int) -> None:
     window = SlidingWindow(capacity, period)
     assert window.period == period
     assert window.capacity == capacity
-    assert window._window == 0.0
+    assert window._window_ns + window._period_ns < 0
     assert window._tokens == capacity
-    assert window._last == 0.0
 
 
 def test_get_tokens_before_trigger() -> None:
@@ -28,6 +28,25 @@ def test_get_tokens_after_trigger() -> None:
     assert window.get_tokens() == 0
 
 
+def test_get_tokens_at_zero() -> None:
+    window = SlidingWindow(1, 1)
+    window.update_ratelimit()
+
+    # move the window so that it has expired now, but hadn't at time 0
+    window._window_ns -= 2 * window._period_ns
+
+    assert window.get_tokens() == 1
+    assert window.get_tokens(0) == 0
+
+
+def test_get_tokens_at_monotonic_time() -> None:
+    window = SlidingWindow(1, 1)
+    window.update_ratelimit()
+
+    assert window.get_tokens(monotonic()) == 0
+    assert window.get_tokens(monotonic() + 10) == 1
+
+
 def test_update_ratelimit() -> None:
     window = SlidingWindow(1, 1)
     retry_after_before = window.update_ratelimit()
@@ -37,6 +56,46 @@ def test_update_ratelimit() -> None:
     assert isclose(retry_after_after, 1.0, rel_tol=0.15)
 
 
+def test_update_ratelimit_n() -> None:
+    window = SlidingWindow(3, 1)
+
+    assert window.update_ratelimit_n(2) is None
+    assert window.get_tokens() == 1
+
+    # test that no units are used if there aren't enough
+    retry_after = window.update_ratelimit_n(2)
+    assert retry_after is not None
+    assert isclose(retry_after, 1.0, rel_tol=0.15)
+    assert window.get_tokens() == 1
+
+    assert window.update_ratelimit_n(1) is None
+    assert window.get_tokens() == 0
+
+
+@pytest.mark.parametrize("n", [-5, 0, 4])
+def test_update_ratelimit_n_invalid(n: int) -> None:
+    window = SlidingWindow(3, 1)
+
+    with pytest.raises(ValueError):
+        window.update_ratelimit_n(n)
+
+    # test that the window was left untouched
+    assert window.get_tokens() == 3
+
+
+def test_failed_update_keeps_refilled_tokens() -> None:
+    window = SlidingWindow(3, 1)
+    window.update_ratelimit_n(3)
+
+    # expire the window, then fail to use more units than it holds
+    window._window_ns -= 2 * window._period_ns
+    assert window._update_ratelimit_at(_clock(), 5) is not None
+
+    # test that the new window still has all of its units
+    assert window.get_tokens() == 3
+    assert window.update_ratelimit() is None
+
+
 def test_retry_after_equals_update_ratelimit_before_trigger() -> None:
     window = SlidingWindow(1, 1)
     retry_after_before = window.get_retry_after()
@@ -65,3 +124,18 @@ def test_reset() -> None:
     window.reset()
 
     assert window.get_tokens() == 1
+
+
+def test_first_window_starts_on_first_trigger() -> None:
+    # the monotonic clock may read less than the period shortly after boot
+    start = 10**9
+    retry_after = (3600 * 10**9 - 1) / 1_000_000_000
+
+    window = SlidingWindow(1, 3600)
+    assert window._update_ratelimit_at(start) is None
+    assert window._update_ratelimit_at(start + 1) == retry_after
+
+    window.reset()
+    assert window._tokens_at(start) == 1
+    assert window._update_ratelimit_at(start) is None
+    assert window._update_ratelimit_at(start + 1) == retry_after